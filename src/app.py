@@ -1,3 +1,4 @@
+import pandas as pd
 import streamlit as st
 from validators import ValidatorApp
 
@@ -28,26 +29,42 @@ with st.sidebar:
             # on_change=app.reset
         )
         app.choose(validator)
-        app.uploaded_file = st.file_uploader(
-            label="Upload the csv file: ",
+        app.uploaded_files = st.file_uploader(
+            label="Upload the csv files: ",
             type="csv",
-            accept_multiple_files=False,
-            help="Upload the csv file meant to be sent for BUF update/delete/insert operations."
+            accept_multiple_files=True,
+            help="Upload the csv files meant to be sent for BUF update/delete/insert operations."
         )
         submit = st.form_submit_button(label="Submit")
 
     st.divider()
     st.caption("[Feedback](<mailto:vasu.jain@spglobal.com?subject=BUF Validator Feedback>)")
 
-if submit and app.uploaded_file:
-    with st.expander("File preview: ", expanded=False):
-        st.dataframe(app.file.df)
-    
-    st.write("Check results:")
-    validation = app.validate(app.file)
-    if validation is not None:
-        st.dataframe(validation, height=35 * len(validation) + 38)
+if submit and app.uploaded_files:
+    st.write("Summary:")
+    summary = st.empty()
+    rows, validations = [], {}
+    for i, file, validation in app.validate_many(app.files):
+        validations[i] = validation
+        rows.append(app.summarize(i, validation))
+        summary.dataframe(pd.DataFrame(rows, columns=app.VIEW_SUMMARY_COLS))
+
+    batch_validation = app.validate_batch()
+    if batch_validation is not None:
+        st.write("Cross-file check results:")
+        st.dataframe(batch_validation, height=35 * len(batch_validation) + 38)
+
+    for i, file in enumerate(app.files):
+        with st.expander(f"{app.label(i)}: ", expanded=len(app.files) == 1):
+            if file.rows is not None:
+                st.write("File preview:")
+                st.dataframe(file.preview(app.PREVIEW_ROWS))
+            st.write("Check results:")
+            validation = validations.get(i)
+            if validation is not None:
+                st.dataframe(validation, height=35 * len(validation) + 38)
+
+    app.close()
     
 else:
-    st.write("Upload file and submit form to continue.")
-
+    st.write("Upload files and submit form to continue.")
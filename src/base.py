@@ -1,6 +1,10 @@
 import io
+import re
 import types
-from typing import Optional, Self, Callable
+import threading
+import time
+from collections import deque
+from typing import Optional, Self, Callable, Iterator
 from dataclasses import dataclass, field, asdict
 from functools import partial
 from pathlib import Path
@@ -18,16 +22,25 @@ class FileType:
 
 class File:
     FALLBACK_ENCODING = "Windows-1252"
+    NON_ASCII = re.compile(rb"[\x80-\xff]")
+    ENCODING_SAMPLE_SIZE = 1024 * 1024
 
     def __init__(self, path: str, bytes: bytes) -> None:
         self.path = Path(path)
         self.bytes = bytes
+        self.chunksize: Optional[int] = None
+        self.memory: Optional["MemoryDecision"] = None
         self._df: Optional[pd.Dataframe] = None
         self._base_df: Optional[pd.Dataframe] = None
+        self._type: Optional[FileType] = None
+        self._columns: Optional[list[str]] = None
+        self._rows: Optional[int] = None
+        self._key_hashes: dict[tuple, pd.Series] = {}
     
     @classmethod
     def from_streamlit(cls, file: UploadedFile):
-        return cls(file.name, file.read())
+        # getvalue shares the upload's buffer instead of copying it
+        return cls(file.name, file.getvalue())
 
 
     @classmethod
@@ -55,8 +68,17 @@ class File:
     @base_df.setter 
     def bsae_df(self, df: pd.DataFrame) -> None:
         self._base_df = df
+
+    @property
+    def chunked(self) -> bool:
+        return self.chunksize is not None
+
+    @property
+    def rows(self) -> Optional[int]:
+        # Row count once parsed (or read through once when chunked), without triggering a parse
+        return self._rows if self._df is None else len(self._df)
     
-    def read_csv(self, encoding: Optional[str]=None) -> pd.DataFrame:
+    def read_csv(self, encoding: Optional[str]=None, **kwargs) -> pd.DataFrame:
         if encoding is None:
             encoding = self.FALLBACK_ENCODING
         return pd.read_csv(
@@ -65,7 +87,8 @@ class File:
             na_values=["NULL", "Null", "null"],
             keep_default_na=False,
             dtype="str",
-            encoding=encoding
+            encoding=encoding,
+            **kwargs
         )
 
     def get_csv(self) -> pd.DataFrame:
@@ -82,10 +105,36 @@ class File:
                 df = pd.DataFrame()
         return df
 
+    def chunks(self) -> Iterator["File"]:
+        # Chunked files are never parsed whole, each chunk is a small in-memory File renamed like its parent
+        rows = 0
+        with self.read_csv(chunksize=self.chunksize) as reader:
+            for df in reader:
+                chunk = File(self.path, None)
+                chunk._type = self.type()
+                chunk._df, chunk._base_df = df, df.copy()
+                if self._columns is not None:
+                    chunk.rename_cols(self._columns)
+                rows += len(df)
+                yield chunk
+        self._rows = rows
+
+    def preview(self, rows: int) -> pd.DataFrame:
+        # Read from the raw bytes, so that it works once the parsed data is freed
+        df = self.read_csv(nrows=rows)
+        return df if self._columns is None else df.set_axis(self._columns, axis=1)
+
     def type(self) -> FileType:
-        extension = self.path.suffix
-        encoding = chardet.detect(self.bytes)["encoding"]
-        return FileType(extension, encoding)
+        if self._type is None:
+            # isascii scans the whole buffer at C speed. Otherwise chardet, which may only read a bounded prefix
+            # of its input, is given the bytes from the first non-ASCII one onwards.
+            if self.bytes.isascii():
+                encoding = "ascii"
+            else:
+                start = self.NON_ASCII.search(self.bytes).start()
+                encoding = chardet.detect(self.bytes[start:start + self.ENCODING_SAMPLE_SIZE])["encoding"]
+            self._type = FileType(self.path.suffix, encoding)
+        return self._type
 
     def add_dt_cols(self, cols: list[str], format: str, suffix: str = "_dt") -> None:
         partial_datetime = partial(pd.to_datetime, format=format)
@@ -97,10 +146,46 @@ class File:
     def rename_cols(self, columns: list[str]):
         # if len(columns) > len(self.base_df.columns):
         #     raise ValueError("More columns than expected")
+        self._columns = columns
+        if self.chunked:
+            return
         self.base_df.columns = columns
         col_mapper = {before: after for (before, after) in zip(self.df.columns[:len(columns)], columns)}
         self.df.rename(col_mapper, axis=1, inplace=True)
 
+    def key_hashes(self, cols: list[str]) -> Optional[pd.Series]:
+        # Hash of the key columns per row, matched case-insensitively so that it does not depend on rename_cols,
+        # None when the columns are not in the file
+        key = tuple(cols)
+        if key not in self._key_hashes:
+            if not self.chunked:
+                lookup = {col.lower(): col for col in self.base_df.columns}
+                if not all(col.lower() in lookup for col in cols):
+                    return None
+                key_df = self.base_df[[lookup[col.lower()] for col in cols]]
+                hashes = pd.util.hash_pandas_object(key_df, index=False)
+            else:
+                parts = []
+                for chunk in self.chunks():
+                    part = chunk.key_hashes(cols)
+                    if part is None:
+                        return None
+                    parts.append(part)
+                hashes = pd.concat(parts) if parts else pd.Series(dtype="uint64")
+            self._key_hashes[key] = hashes
+        return self._key_hashes[key]
+
+    def free(self) -> None:
+        # Drops the parsed data once validated, keeping the row count
+        if self._df is not None:
+            self._rows = len(self._df)
+        self._df = self._base_df = None
+
+    def close(self) -> None:
+        self.free()
+        self.bytes = None
+        self._key_hashes.clear()
+
 # Results for validations
 
 @dataclass
@@ -152,6 +237,20 @@ class Result:
         )
         return r
 
+    @classmethod
+    def merge(cls, results: list['Result']) -> Self:
+        # Combines the results of one check over the chunks of a file
+        values = list(dict.fromkeys(v for r in results if r.values for v in r.values))
+        indices = [r.indices for r in results if r.indices is not None]
+        r = cls(
+            result = all(r.result for r in results),
+            error_count = sum(r.error_count for r in results),
+            values = values or None,
+            indices = indices[0].append(indices[1:]) if indices else None,
+            comments = next((r.comments for r in results if r.comments), None)
+        )
+        return r
+
     @classmethod
     def column_na(cls, col_val: ColumnValidity) -> 'Result':
         r = cls(
@@ -168,12 +267,18 @@ CheckFunc = Callable[["Check", File], Result]
 
 @dataclass
 class Check:
+    # Scope of a check on a chunked file: once on the first chunk, on every chunk, or once on the whole file
+    HEADER = "header"
+    ROW = "row"
+    FILE = "file"
+
     level: str
     name: str
     code: str
     description: str
     func: CheckFunc
     data: dict = field(init=False)
+    scope: str = field(default=ROW, kw_only=True)
 
     def __post_init__(self):
         self.func = types.MethodType(self.func, self)
@@ -217,12 +322,27 @@ class CheckGroup:
 
     def validate(self, file: File) -> pd.DataFrame:
         checks_series = pd.Series(self.checks, name="checks")
-        results_series = pd.Series(checks_series.apply(lambda x: x.check(file)), name="results")
+        if file.chunked:
+            results_series = pd.Series(self.check_chunks(file), name="results", dtype=object)
+        else:
+            results_series = pd.Series(checks_series.apply(lambda x: x.check(file)), name="results")
         checks_df = pd.json_normalize(checks_series.apply(asdict).to_list(), max_level=0)
         results_df = pd.json_normalize(results_series.apply(asdict).to_list(), max_level=0)
         results = pd.merge(checks_df, results_df, left_index=True, right_index=True)
         return results
 
+    def check_chunks(self, file: File) -> list[Result]:
+        # Only the failing values and indices of each chunk are kept
+        chunk_results = [[] for _ in self.checks]
+        for i, chunk in enumerate(file.chunks()):
+            for check, results in zip(self.checks, chunk_results):
+                if check.scope == Check.ROW or (check.scope == Check.HEADER and i == 0):
+                    results.append(check.check(chunk))
+        return [
+            check.check(file) if check.scope == Check.FILE else Result.merge(results)
+            for check, results in zip(self.checks, chunk_results)
+        ]
+
     def __iter__(self):
         for check in self.checks:
             yield check
@@ -232,6 +352,181 @@ class CheckGroup:
             check.data = data
             check.description = check.description.format_map(data)
 
+# Cross-file checks over a batch of files
+
+class HashIndex:
+    """Shared index of row-key hashes across every file of a batch, files are keyed by their position in the batch."""
+
+    def __init__(self, cols: list[str]) -> None:
+        self.cols = cols
+        self._hashes: dict[int, pd.Series] = {}
+        self._shared: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+
+    def add(self, key: int, file: File) -> bool:
+        hashes = file.key_hashes(self.cols)
+        if hashes is None:
+            return False
+        with self._lock:
+            self._hashes[key] = hashes
+            self._shared = None
+        return True
+
+    def shared(self) -> pd.DataFrame:
+        # (hash, file) pairs of the keys found in more than one file, built once for the whole batch
+        with self._lock:
+            if self._shared is None:
+                pairs = pd.concat(
+                    [pd.DataFrame({"hash": hashes.to_numpy(), "file": key}) for (key, hashes) in self._hashes.items()]
+                    or [pd.DataFrame(columns=["hash", "file"])]
+                ).drop_duplicates()
+                self._shared = pairs[pairs.duplicated("hash", keep=False)]
+            return self._shared
+
+    def duplicates(self, key: int) -> Result:
+        if key not in self._hashes:
+            # Neither passed nor failed
+            return Result(
+                result=None,
+                error_count=None,
+                comments=f"Not checked, key columns {self.cols} could not be read from the file."
+            )
+        shared = self.shared()
+        own = shared["file"] == key
+        hashes = self._hashes[key]
+        is_dupe = hashes.isin(shared.loc[own, "hash"])
+        others = shared.loc[~own & shared["hash"].isin(shared.loc[own, "hash"]), "file"]
+        r = Result.from_col(~is_dupe)
+        r.values = sorted(others.unique()) if not r.result else None
+        if not r.result:
+            r.comments = f"{r.error_count} row(s) share keys {self.cols} with other files in the batch."
+        return r
+
+# Memory governance shared by every job of the app
+
+@dataclass
+class MemoryDecision:
+    file: str
+    mode: str
+    estimate: int
+    comments: Optional[str] = field(default=None, kw_only=True)
+
+class MemoryGovernor:
+    """Estimates the footprint of a file before parsing and reserves it against per-job and global memory budgets while it is validated."""
+    MEMORY = "memory"
+    CHUNKED = "chunked"
+    REJECTED = "rejected"
+    SAMPLE_SIZE = 64 * 1024
+    # Rough costs per cell (str object and its pointers in df and base_df), per row (check masks and _dt columns)
+    # and per row of key hashes (the file's hashes and its share of the batch's cross-file map)
+    CELL_BYTES = 64
+    ROW_BYTES = 64
+    HASH_BYTES = 32
+
+    def __init__(self, job_budget: int, global_budget: int, chunk_rows: int, timeout: float) -> None:
+        self.job_budget = job_budget
+        self.global_budget = global_budget
+        self.chunk_rows = chunk_rows
+        self.timeout = timeout
+        self._reserved = 0
+        self._held: dict[object, int] = {}
+        self._queue: deque[object] = deque()
+        self._condition = threading.Condition()
+
+    @property
+    def budget(self) -> int:
+        return min(self.job_budget, self.global_budget)
+
+    def estimate(self, size: int, sample: bytes) -> tuple[int, int]:
+        # Footprint (in memory, chunked) from the byte size and the column count of the header.
+        # The raw bytes share the upload's buffer and are counted once.
+        if not sample:
+            return size, size
+        columns = sample.split(b"\n", 1)[0].count(b",") + 1
+        rows = size * sample.count(b"\n") // len(sample)
+        row_bytes = columns * self.CELL_BYTES + self.ROW_BYTES
+        # Raw bytes, parsed frames and key hashes
+        in_memory = size + rows * (row_bytes + self.HASH_BYTES)
+        # Raw bytes, a single parsed chunk and key hashes
+        chunked = size + min(rows, self.chunk_rows) * row_bytes + rows * self.HASH_BYTES
+        return in_memory, chunked
+
+    def decide(self, name: str, size: int, sample: bytes) -> MemoryDecision:
+        # Against the job budget only, before any copy of the upload is made
+        in_memory, chunked = self.estimate(size, sample)
+        if in_memory <= self.budget:
+            return MemoryDecision(name, self.MEMORY, in_memory)
+        if chunked <= self.budget:
+            return MemoryDecision(
+                name, self.CHUNKED, chunked,
+                comments=f"Estimated {in_memory / 2**20:.0f} MB exceeds the {self.budget / 2**20:.0f} MB job budget, validated in chunks of {self.chunk_rows} rows."
+            )
+        return MemoryDecision(
+            name, self.REJECTED, chunked,
+            comments=f"Estimated {chunked / 2**20:.0f} MB even in chunks exceeds the {self.budget / 2**20:.0f} MB job budget, file not validated."
+        )
+
+    def acquire(self, amounts: list[int], owner: object) -> Optional[int]:
+        # Reserves the first of the amounts that fits the global budget and returns its position, None on timeout.
+        # Jobs are served first come, first served. The timeout only runs while the owner holds nothing itself,
+        # so an owner never gives up waiting on its own running jobs.
+        ticket = object()
+        deadline = None
+        with self._condition:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    if self._queue[0] is ticket:
+                        for i, amount in enumerate(amounts):
+                            if self._reserved + amount <= self.global_budget:
+                                self._reserved += amount
+                                self._held[owner] = self._held.get(owner, 0) + amount
+                                return i
+                    if self._held.get(owner):
+                        deadline = None
+                        self._condition.wait()
+                        continue
+                    deadline = deadline or time.monotonic() + self.timeout
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self._condition.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                self._condition.notify_all()
+
+    def release(self, amount: int, owner: object) -> None:
+        with self._condition:
+            self._reserved -= amount
+            self._held[owner] -= amount
+            if not self._held[owner]:
+                del self._held[owner]
+            self._condition.notify_all()
+
+    def admit(self, file: File, owner: object) -> MemoryDecision:
+        # Reserves for the validation of the file, in chunks when the in-memory estimate does not fit.
+        # The caller releases decision.estimate once the file is validated.
+        in_memory, chunked = self.estimate(len(file.bytes), file.bytes[:self.SAMPLE_SIZE])
+        candidates = [(mode, amount) for (mode, amount) in [(self.MEMORY, in_memory), (self.CHUNKED, chunked)] if amount <= self.budget]
+        i = self.acquire([amount for (_, amount) in candidates], owner) if candidates else None
+        if i is None:
+            decision = MemoryDecision(
+                file.path.name, self.REJECTED, chunked,
+                comments=f"Timed out after {self.timeout:.0f}s waiting for {chunked / 2**20:.0f} MB of the shared memory budget, file not validated."
+                if candidates else f"Estimated {chunked / 2**20:.0f} MB even in chunks exceeds the {self.budget / 2**20:.0f} MB job budget, file not validated."
+            )
+        elif candidates[i][0] == self.MEMORY:
+            decision = MemoryDecision(file.path.name, self.MEMORY, in_memory)
+        else:
+            file.chunksize = self.chunk_rows
+            reason = "exceeds the job budget" if in_memory > self.budget else "does not fit the shared budget now"
+            decision = MemoryDecision(
+                file.path.name, self.CHUNKED, chunked,
+                comments=f"Estimated {in_memory / 2**20:.0f} MB in memory {reason}, validated in chunks of {self.chunk_rows} rows."
+            )
+        file.memory = decision
+        return decision
+
 # Validator which bundles together the Check for a single BUF type
 
 @dataclass
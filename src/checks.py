@@ -100,13 +100,10 @@ def func_is_in_values(col: str, values: list[str]) -> CheckFunc:
         return r
     return check_func
 
-def func_is_duplicate(cols: list[str]) -> CheckFunc:
-    def check_func(check: Check, file: File) -> Result:
-        is_dupe = file.df.duplicated(cols, keep=False)
-        file.df[check.code] = ~is_dupe
-        r = Result.from_col(file.df[check.code])
-        return r
-    return check_func
+def func_is_duplicate(check: Check, file: File) -> Result:
+    is_dupe = file.key_hashes(check.data["key_columns"]).duplicated(keep=False)
+    r = Result.from_col(~is_dupe)
+    return r
 
 def func_processtype_ud_symbolid(check: Check, file: File) -> Result:
     is_process = file.df["processType"].isin(["U", "D"])
@@ -131,6 +128,7 @@ def func_processtype_iu_activeflag_enddate(check: Check, file: File) -> Result:
     return r
 
 def func_processtype_iu_endgtstart(check: Check, file: File) -> Result:
+    file.add_dt_cols(check.data["date_columns"], check.data["date_format"])
     is_process = file.df['processType'].isin(['U', 'I'])
     is_na = file.df["symbolStartDate"].isna() | file.df["symbolEndDate"].isna()
     is_nat = file.df["symbolStartDate_dt"].isna() | file.df["symbolEndDate_dt"].isna()
@@ -144,19 +142,22 @@ def func_processtype_iu_endgtstart(check: Check, file: File) -> Result:
 check_file_extension = Check(
     "File", "File extension", "file_extension",
     "File extension must be {extension}.",
-    func=func_file_extension
+    func=func_file_extension,
+    scope=Check.HEADER
 )
 
 check_file_encoding = Check(
     "File", "File encoding", "file_encoding",
     "File encoding must be {encoding}.",
-    func=func_file_encoding
+    func=func_file_encoding,
+    scope=Check.HEADER
 )
 
 check_file_name = Check(
     "File", "File name", "file_name",
     "File name must be of type: {valid_filename_example}",
-    func=func_file_name
+    func=func_file_name,
+    scope=Check.HEADER
 )
 
 check_blank_values = Check(
@@ -174,7 +175,8 @@ check_valid_characters = Check(
 check_all_columns = Check(
     "File", "Columns", "all_columns",
     "All columns specified must be present in the file in correct order.",
-    func=func_all_columns
+    func=func_all_columns,
+    scope=Check.HEADER
 )
 
 check_validation_symbolID = Check(
@@ -240,7 +242,8 @@ check_validation_processType = Check(
 check_unique_values = Check(
     "Data", "Unique Values", "symbol_dupes",
     "There should not be any dupes for the same symbolvalue, symboltypeId and obectid in the file.",
-    func=func_is_duplicate(["symbolValue", "symbolTypeId", "objectId", "symbolId"])
+    func=func_is_duplicate,
+    scope=Check.FILE
 )
 
 check_processtype_ud_symbolid = Check(
@@ -1,12 +1,21 @@
+import configparser
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator
+
 from base import *
 from checks import *
 
+config = configparser.ConfigParser()
+config.read(Path(__file__).with_name("config.ini"))
+MEMORY_CONFIG = config["MEMORY"]
+
 # Validator instances for the BUF types customized for their data and checks
 
 buf_1 = Validator(
     type="BUF 1.0", 
     data={
         "columns": ["symbolId", "symbolTypeId", "symbolValue", "exchangeId", "objectId", "symbolStartDate", "symbolEndDate", "activeFlag", "primaryFlag", "processType"],
+        "key_columns": ["symbolValue", "symbolTypeId", "objectId", "symbolId"],
         "date_columns": ["symbolStartDate", "symbolEndDate"],
         "date_format": '%m/%d/%Y',
         "date_format_desc": "MM/DD/YY",
@@ -56,11 +65,23 @@ class ValidatorApp:
         "BUF 3.0 - Entity": None
     }
     VIEW_RESULTS_COLS = ["level", "name", "code", "description", "result", "error_count", "values", "indices", "comments"]
+    VIEW_SUMMARY_COLS = ["file", "rows", "result", "failed_checks", "error_count", "memory", "memory_estimate_mb", "memory_comments"]
+    VIEW_BATCH_COLS = ["file", "result", "error_count", "values", "indices", "comments"]
+    MAX_WORKERS = 4
+    PREVIEW_ROWS = 1000
+    # Shared by every session of the app server
+    GOVERNOR = MemoryGovernor(
+        job_budget=MEMORY_CONFIG.getint("job_budget_mb") * 2**20,
+        global_budget=MEMORY_CONFIG.getint("global_budget_mb") * 2**20,
+        chunk_rows=MEMORY_CONFIG.getint("chunk_rows"),
+        timeout=MEMORY_CONFIG.getfloat("timeout_s")
+    )
 
     def __init__(self):
         self.validator: Optional[Validator] = None
-        self._uploaded_file: Optional[UploadedFile] = None
-        self.file: Optional[File] = None
+        self._uploaded_files: list[UploadedFile] = []
+        self.files: list[File] = []
+        self.index: Optional[HashIndex] = None
 
     def choose(self, validator: str):
         self.validator = self.VALIDATORS[validator]
@@ -70,15 +91,104 @@ class ValidatorApp:
             df = self.validator.validate(file)[self.VIEW_RESULTS_COLS]
             return df
 
+    def _validate_indexed(self, key: int, file: File):
+        if file.memory and file.memory.mode == MemoryGovernor.REJECTED:
+            return self.error_validation(file.memory.comments)
+        decision = self.GOVERNOR.admit(file, owner=self)
+        if decision.mode == MemoryGovernor.REJECTED:
+            return self.error_validation(decision.comments)
+        try:
+            # Indexed before validation, so that files failing a check still take part in the cross-file checks
+            if self.index is not None:
+                self.index.add(key, file)
+            return self.validate(file)
+        finally:
+            file.free()
+            self.GOVERNOR.release(decision.estimate, owner=self)
+
+    def validate_many(self, files: list[File]) -> Iterator[tuple[int, File, Optional[pd.DataFrame]]]:
+        # Yields each file's position and results as soon as its worker finishes, a failing file does not stop the batch
+        key_columns = self.validator.data.get("key_columns") if self.validator else None
+        self.index = HashIndex(key_columns) if key_columns else None
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as pool:
+            futures = {pool.submit(self._validate_indexed, i, file): i for (i, file) in enumerate(files)}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    validation = future.result()
+                except Exception as e:
+                    validation = self.error_validation(f"Validation failed due to {e!r}")
+                yield i, files[i], validation
+
+    def error_validation(self, comments: str) -> pd.DataFrame:
+        error = dict(
+            level="File", name="Validation", code="validation_error",
+            description="File must be validated without errors.",
+            result=False, error_count=1, values=None, indices=None, comments=comments
+        )
+        return pd.DataFrame([error], columns=self.VIEW_RESULTS_COLS)
+
+    def label(self, i: int) -> str:
+        # Display name, unique even for uploads sharing a file name
+        return f"{i + 1}. {self.files[i].path.name}"
+
+    def summarize(self, i: int, validation: Optional[pd.DataFrame]) -> dict:
+        file = self.files[i]
+        memory = dict(
+            memory=file.memory.mode if file.memory else None,
+            memory_estimate_mb=round(file.memory.estimate / 2**20, 1) if file.memory else None,
+            memory_comments=file.memory.comments if file.memory else None
+        )
+        if validation is None:
+            return dict(file=self.label(i), rows=file.rows, result=None, failed_checks=None, error_count=None, **memory)
+        failed = validation.loc[~validation["result"].astype(bool), "name"]
+        return dict(
+            file=self.label(i),
+            rows=file.rows,
+            result=failed.empty,
+            failed_checks=len(failed),
+            error_count=int(validation["error_count"].sum()),
+            **memory
+        )
+
+    def validate_batch(self) -> Optional[pd.DataFrame]:
+        # Cross-file checks, run once every file of the batch is indexed
+        if self.index is None or len(self.files) < 2:
+            return None
+        results = [self.index.duplicates(i) for i in range(len(self.files))]
+        for r in results:
+            r.values = [self.label(key) for key in r.values] if r.values else None
+        df = pd.json_normalize([asdict(r) for r in results], max_level=0)
+        df.insert(0, "file", [self.label(i) for i in range(len(self.files))])
+        return df[self.VIEW_BATCH_COLS]
+
     @property
-    def uploaded_file(self) -> Optional[UploadedFile]:
-        return self._uploaded_file
+    def uploaded_files(self) -> list[UploadedFile]:
+        return self._uploaded_files
+
+    @uploaded_files.setter
+    def uploaded_files(self, value: Optional[list[UploadedFile]]):
+        self.close()
+        self._uploaded_files = list(value) if value else []
+        self.files = [self.load(f) for f in self._uploaded_files]
+
+    def load(self, uploaded_file: UploadedFile) -> File:
+        # Uploads over the job budget even in chunks are rejected from their size and a sample, without taking their bytes
+        uploaded_file.seek(0)
+        sample = uploaded_file.read(MemoryGovernor.SAMPLE_SIZE)
+        uploaded_file.seek(0)
+        decision = self.GOVERNOR.decide(uploaded_file.name, uploaded_file.size, sample)
+        file = File(uploaded_file.name, None) if decision.mode == MemoryGovernor.REJECTED else File.from_streamlit(uploaded_file)
+        file.memory = decision
+        return file
 
-    @uploaded_file.setter
-    def uploaded_file(self, value: UploadedFile):
-        self._uploaded_file = value
-        self.file = File.from_streamlit(value) if value else None
+    def close(self):
+        # Drops the batch's data once its results are rendered
+        for file in self.files:
+            file.close()
+        self.index = None
     
     def reset(self):
-        if self.uploaded_file:
-            self.uploaded_file = None
+        if self.uploaded_files:
+            self.uploaded_files = []
+            self.index = None